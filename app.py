@@ -2,94 +2,43 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import matplotlib.pyplot as plt
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
+from plotly_resampler import FigureResampler
+from xlsxwriter.utility import xl_col_to_name
 import io
-import os
 import time
+from streamlit_autorefresh import st_autorefresh
 from db_connection import get_connection
+from pdf_export import create_pdf
 from datetime import datetime
 
-# -----------------------------
-# PDF CREATION FUNCTION
-# -----------------------------
-def create_pdf(df, report_title="Sales Report"):
-    pdf_file = "sales_report.pdf"
-    doc = SimpleDocTemplate(pdf_file, pagesize=letter)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    elements.append(Paragraph(report_title, styles['Title']))
-    elements.append(Paragraph("Generated using Streamlit & Python", styles['Normal']))
-    elements.append(Spacer(1,12))
-
-    chart_file = "chart.png"
-    if 'amount' in df.columns or 'total_amount' in df.columns:
-        plt.figure(figsize=(6,3))
-        if 'product_name' in df.columns:
-            plt.bar(df['product_name'], df['amount'] if 'amount' in df.columns else df['total_amount'], color='skyblue')
-            plt.ylabel("Amount")
-            plt.title("Sales by Product")
-        elif 'category' in df.columns:
-            plt.pie(df['total_amount'], labels=df['category'], autopct='%1.1f%%')
-            plt.title("Sales by Category")
-        plt.tight_layout()
-        plt.savefig(chart_file)
-        plt.close()
-        elements.append(Image(chart_file, width=400, height=200))
-        elements.append(Spacer(1,12))
-
-    data = [df.columns.tolist()] + df.values.tolist()
-    table = Table(data, repeatRows=1)
-    style = TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#4F81BD')),
-        ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
-        ('ALIGN',(0,0),(-1,-1),'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-    ])
-    table.setStyle(style)
-
-    top_amounts = df['total_amount'].nlargest(3).tolist() if 'total_amount' in df.columns else df['amount'].nlargest(3).tolist()
-    for i, row in enumerate(df.values.tolist(), start=1):
-        value = row[df.columns.get_loc('total_amount') if 'total_amount' in df.columns else df.columns.get_loc('amount')]
-        bg_color = colors.HexColor('#FFD700') if value in top_amounts else (colors.HexColor('#DCE6F1') if i%2==0 else colors.whitesmoke)
-        table.setStyle(TableStyle([('BACKGROUND', (0,i), (-1,i), bg_color)]))
-
-    elements.append(table)
-    doc.build(elements)
-
-    if os.path.exists(chart_file):
-        os.remove(chart_file)
-
-    return pdf_file
-
 # -----------------------------
 # EXCEL EXPORT FUNCTION
 # -----------------------------
 def create_excel_with_chart(df):
     output = io.BytesIO()
+    amt_col = 'total_amount' if 'total_amount' in df.columns else 'amount'
+    amt_idx = df.columns.get_loc(amt_col)
+    name_idx = df.columns.get_loc('category' if 'category' in df.columns else 'product_name')
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         df.to_excel(writer, index=False, sheet_name="Report")
         workbook = writer.book
         worksheet = writer.sheets["Report"]
 
-        top_amounts = df['total_amount'].nlargest(3).tolist() if 'total_amount' in df.columns else df['amount'].nlargest(3).tolist()
         format_top = workbook.add_format({'bg_color': '#FFD700', 'font_color': 'black'})
-        for i, val in enumerate(df.iloc[:, -1]):
-            if val in top_amounts:
-                worksheet.set_row(i+1, None, format_top)
+        if df[amt_col].notna().any():
+            # Excel evaluates the top-3 rule itself, so no per-row Python loop is needed.
+            threshold = float(df[amt_col].nlargest(3).min())
+            worksheet.conditional_format(1, 0, len(df), len(df.columns)-1, {
+                'type': 'formula',
+                'criteria': f'=${xl_col_to_name(amt_idx)}2>={threshold!r}',
+                'format': format_top
+            })
 
         chart = workbook.add_chart({'type': 'column'})
-        col_amount = df.columns.get_loc('total_amount') + 1 if 'total_amount' in df.columns else df.columns.get_loc('amount') + 1
-        col_name = df.columns.get_loc('category') + 1 if 'category' in df.columns else df.columns.get_loc('product_name') + 1
         chart.add_series({
             'name': 'Sales Amount',
-            'categories': ['Report', 1, col_name-1, len(df), col_name-1],
-            'values': ['Report', 1, col_amount-1, len(df), col_amount-1],
+            'categories': ['Report', 1, name_idx, len(df), name_idx],
+            'values': ['Report', 1, amt_idx, len(df), amt_idx],
             'fill': {'color': '#4F81BD'}
         })
         chart.set_title({'name': 'Sales Chart'})
@@ -97,17 +46,83 @@ def create_excel_with_chart(df):
         chart.set_y_axis({'name': 'Amount'})
         worksheet.insert_chart('H2', chart)
 
-    return output.getvalue()
+    # Hand back the buffer itself; getvalue() would copy the whole workbook.
+    output.seek(0)
+    return output
+
+# -----------------------------
+# CACHED EXPORTS
+# -----------------------------
+def hash_frame(df):
+    # hash_pandas_object covers values and index only, so the schema is part of the key too.
+    # Row hashes include the index, so the same rows in a different order hash differently.
+    return (tuple(df.columns), tuple(map(str, df.dtypes)), int(pd.util.hash_pandas_object(df).sum()))
+
+# Parameters with a leading underscore are not hashed by Streamlit; the remaining arguments are the key.
+@st.cache_data(show_spinner=False, max_entries=8)
+def create_pdf_bytes(df_hash, _df, report_title):
+    return create_pdf(_df, report_title=report_title)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def create_excel_buffer(df_hash, _df):
+    return create_excel_with_chart(_df)
 
 # -----------------------------
 # FETCH DATA FUNCTION
 # -----------------------------
-def fetch_data(query):
+# DATE columns arrive as datetime.date objects, which the Arrow backend would store as strings.
+DATE_COLUMNS = ('sale_date', 'min_date', 'max_date')
+
+def read_sql(query, params=None):
     conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
+    try:
+        # Arrow-backed columns avoid boxing every cell as a Python object.
+        df = pd.read_sql(query, conn, params=params, dtype_backend="pyarrow")
+    finally:
+        conn.close()
+    for c in DATE_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].astype("date32[pyarrow]")
     return df
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_data(query, params=None):
+    # Lookups that rarely change (distinct products/categories) are served from memory.
+    return read_sql(query, params)
+
+@st.cache_data(ttl=5, show_spinner=False)
+def fetch_date_range():
+    # MAX(sale_date) moves as new sales arrive; expire within the shortest refresh interval (5 s).
+    return read_sql("SELECT MIN(sale_date) AS min_date, MAX(sale_date) AS max_date FROM sales")
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_live_data(query, params, refresh_bucket):
+    # refresh_bucket changes once per refresh interval, so results stay cached within it.
+    return read_sql(query, params)
+
+def fetch_kpis(base_condition, params, refresh_bucket):
+    return fetch_live_data(f"""
+        SELECT COALESCE(SUM(quantity*unit_price), 0) AS total_sales, CAST(COALESCE(SUM(quantity), 0) AS SIGNED) AS total_qty,
+               COUNT(DISTINCT product_name) AS num_products, COUNT(DISTINCT category) AS num_categories,
+               COUNT(*) AS num_rows
+        FROM sales
+        WHERE {base_condition}
+    """, params, refresh_bucket)
+
+# -----------------------------
+# TIME-SERIES CHART FUNCTION
+# -----------------------------
+def resampled_line(df, x, y, title, n_samples=2000):
+    # One-time LTTB downsample to at most n_samples points. Streamlit has no Dash callback,
+    # so zooming does not re-resample; trace names are reset to hide the resampler's "[R]" markup.
+    df = df.assign(**{x: pd.to_datetime(df[x]), y: df[y].astype('float64')})
+    fig = px.line(df, x=x, y=y, markers=True, title=title)
+    names = [trace.name for trace in fig.data]
+    fig = FigureResampler(fig, default_n_shown_samples=n_samples, show_mean_aggregation_size=False)
+    for trace, name in zip(fig.data, names):
+        trace.name = name
+    return fig
+
 # -----------------------------
 # STREAMLIT CONFIG
 # -----------------------------
@@ -120,16 +135,22 @@ st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Dashboard", "Dynamic KPIs", "Export Excel", "Export PDF"])
 
 st.sidebar.subheader("Filters")
-date_range_df = fetch_data("SELECT MIN(sale_date) as min_date, MAX(sale_date) as max_date FROM sales")
+date_range_df = fetch_date_range()
 min_date = date_range_df['min_date'][0]
 max_date = date_range_df['max_date'][0]
 start_date = st.sidebar.date_input("Start Date", min_value=min_date, max_value=max_date, value=min_date)
 end_date = st.sidebar.date_input("End Date", min_value=min_date, max_value=max_date, value=max_date)
 
-product_options = fetch_data("SELECT DISTINCT product_name FROM sales")['product_name'].tolist()
+# Distinct products and categories in one round-trip, tagged by the kind column.
+filter_df = fetch_data("""
+    SELECT DISTINCT 'product' AS kind, product_name AS value FROM sales
+    UNION ALL
+    SELECT DISTINCT 'category', category FROM sales
+""")
+product_options = filter_df.loc[filter_df['kind'] == 'product', 'value'].tolist()
 selected_products = st.sidebar.multiselect("Products", product_options, default=product_options)
 
-category_options = fetch_data("SELECT DISTINCT category FROM sales")['category'].tolist()
+category_options = filter_df.loc[filter_df['kind'] == 'category', 'value'].tolist()
 selected_categories = st.sidebar.multiselect("Categories", category_options, default=category_options)
 
 query_option = st.sidebar.selectbox("Report Type", ["All Sales Data", "Sales by Product", "Daily Sales Summary", "Sales by Category"])
@@ -139,20 +160,29 @@ query_option = st.sidebar.selectbox("Report Type", ["All Sales Data", "Sales by
 # -----------------------------
 refresh_sec = st.sidebar.slider("⏱️ Refresh Interval (seconds)", 5, 60, 10)
 pause_refresh = st.sidebar.checkbox("⏸️ Pause Auto-Refresh", value=False)
-if "last_refresh" not in st.session_state:
-    st.session_state.last_refresh = time.time()
+refresh_bucket = int(time.time() // refresh_sec)
 
 # -----------------------------
 # SQL QUERY
 # -----------------------------
-base_condition = f"sale_date BETWEEN '{start_date}' AND '{end_date}'"
+# Filter values are bound as %s parameters; only the placeholder count varies the SQL text.
+base_condition = "sale_date BETWEEN %s AND %s"
+base_params = [start_date, end_date]
 if selected_products:
-    base_condition += " AND product_name IN (" + ",".join(f"'{p}'" for p in selected_products) + ")"
+    base_condition += " AND product_name IN (" + ",".join(["%s"] * len(selected_products)) + ")"
+    base_params += selected_products
 if selected_categories:
-    base_condition += " AND category IN (" + ",".join(f"'{c}'" for c in selected_categories) + ")"
+    base_condition += " AND category IN (" + ",".join(["%s"] * len(selected_categories)) + ")"
+    base_params += selected_categories
+base_params = tuple(base_params)
 
 if query_option == "All Sales Data":
-    query = f"SELECT *, quantity*unit_price AS amount FROM sales WHERE {base_condition}"
+    query = f"""
+        SELECT *, quantity*unit_price AS amount
+        FROM sales
+        WHERE {base_condition}
+        ORDER BY sale_date DESC, id DESC
+    """
 elif query_option == "Sales by Product":
     query = f"""
         SELECT product_name, SUM(quantity) AS total_qty, SUM(quantity*unit_price) AS total_amount
@@ -176,18 +206,19 @@ elif query_option == "Sales by Category":
         GROUP BY category
     """
 
-df = fetch_data(query)
+# The report query only runs on pages that use it (see CONDITIONAL RENDERING below).
 
 # -----------------------------
 # RENDER DASHBOARD FUNCTION
 # -----------------------------
-def render_dashboard():
+def render_dashboard(df):
     st.title("📊 Sales Dashboard")
 
-    total_sales = df['amount'].sum() if 'amount' in df.columns else df['total_amount'].sum()
-    total_qty = df['quantity'].sum() if 'quantity' in df.columns else df['total_qty'].sum()
-    num_products = df['product_name'].nunique() if 'product_name' in df.columns else "N/A"
-    num_categories = df['category'].nunique() if 'category' in df.columns else "N/A"
+    kpis = fetch_kpis(base_condition, base_params, refresh_bucket).iloc[0]
+    total_sales = kpis['total_sales']
+    total_qty = kpis['total_qty']
+    num_products = kpis['num_products']
+    num_categories = kpis['num_categories']
 
     kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
     kpi_col1.metric("Total Sales", f"${total_sales:,.2f}")
@@ -200,16 +231,26 @@ def render_dashboard():
         fig = px.bar(df, x='product_name', y='total_amount', text='total_amount', color='total_amount',
                      color_continuous_scale='Blues', title="Sales Amount by Product")
     elif query_option == "Daily Sales Summary":
-        fig = px.line(df, x='sale_date', y='total_amount', markers=True, title="Daily Sales Amount")
+        fig = resampled_line(df, 'sale_date', 'total_amount', "Daily Sales Amount")
     elif query_option == "Sales by Category":
         fig = px.pie(df, names='category', values='total_amount', title="Sales Amount by Category")
     else:
-        fig = px.bar(df, x='product_name', y='amount', color='category', title="Sales Amount by Product")
+        chart_df = fetch_live_data(f"""
+            SELECT product_name, category, SUM(quantity*unit_price) AS amount
+            FROM sales
+            WHERE {base_condition}
+            GROUP BY product_name, category
+        """, base_params, refresh_bucket)
+        fig = px.bar(chart_df, x='product_name', y='amount', color='category', title="Sales Amount by Product")
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("📋 Sales Data Table")
-    highlight_col = 'amount' if 'amount' in df.columns else 'total_amount'
-    st.dataframe(df.style.highlight_max(subset=[highlight_col], color='gold'))
+    # Plain frame goes over Arrow; a Styler would be rendered to HTML cell by cell.
+    money_config = {
+        c: st.column_config.NumberColumn(format="$%.2f")
+        for c in ('amount', 'total_amount', 'unit_price') if c in df.columns
+    }
+    st.dataframe(df, use_container_width=True, column_config=money_config)
 
 # -----------------------------
 # AUTO-REFRESH LOGIC
@@ -219,31 +260,40 @@ def render_dashboard():
 # -----------------------------
 
 if page == "Dashboard":
-    render_dashboard()
-
-    # AUTO-REFRESH
+    table_query = query
+    if query_option == "All Sales Data":
+        # The dashboard fetches one page of raw rows; its chart uses its own aggregated query
+        # and the export pages still fetch the full report.
+        page_size = st.sidebar.number_input("Rows per Page", min_value=50, max_value=5000, value=500, step=50)
+        num_rows = int(fetch_kpis(base_condition, base_params, refresh_bucket)['num_rows'][0])
+        num_pages = max(1, -(-num_rows // page_size))
+        page_number = st.sidebar.selectbox("Page", range(1, num_pages + 1), format_func=lambda n: f"{n} of {num_pages}")
+        table_query = f"{query} LIMIT {int(page_size)} OFFSET {int((page_number - 1) * page_size)}"
+    render_dashboard(fetch_live_data(table_query, base_params, refresh_bucket))
+
+    # AUTO-REFRESH (client-side timer, so no server thread is blocked between reruns)
     if not pause_refresh:
-        time.sleep(refresh_sec)
-        st.rerun()
+        st_autorefresh(interval=refresh_sec*1000, limit=None, key="dashboard_refresh")
     else:
         st.info("⏸️ Auto-refresh paused. Uncheck the box to resume live updates.")
 
 elif page == "Dynamic KPIs":
     st.title("📊 Dynamic KPIs Dashboard")
-    monthly_df = fetch_data(f"""
+    monthly_df = fetch_live_data(f"""
         SELECT DATE_FORMAT(sale_date, '%Y-%m') AS month, SUM(quantity*unit_price) AS total_amount
         FROM sales
         WHERE {base_condition}
         GROUP BY month
         ORDER BY month
-    """)
-    fig = px.line(monthly_df, x='month', y='total_amount', markers=True, title="Monthly Sales Trend")
+    """, base_params, refresh_bucket)
+    fig = resampled_line(monthly_df, 'month', 'total_amount', "Monthly Sales Trend")
     st.plotly_chart(fig, use_container_width=True)
 
 elif page == "Export Excel":
     st.title("💾 Export Excel with Chart")
     if st.button("Download Excel Report"):
-        excel_data = create_excel_with_chart(df)
+        df = fetch_live_data(query, base_params, refresh_bucket)
+        excel_data = create_excel_buffer(hash_frame(df), df)
         st.download_button(
             label="Download Excel",
             data=excel_data,
@@ -254,11 +304,11 @@ elif page == "Export Excel":
 elif page == "Export PDF":
     st.title("💾 Export PDF with Chart")
     if st.button("Download PDF Report"):
-        pdf_file = create_pdf(df, report_title=query_option)
-        with open(pdf_file, "rb") as f:
-            st.download_button(
-                label="Download PDF",
-                data=f,
-                file_name="sales_report.pdf",
-                mime="application/pdf"
-            )
+        df = fetch_live_data(query, base_params, refresh_bucket)
+        pdf_data = create_pdf_bytes(hash_frame(df), df, query_option)
+        st.download_button(
+            label="Download PDF",
+            data=pdf_data,
+            file_name="sales_report.pdf",
+            mime="application/pdf"
+        )
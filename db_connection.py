@@ -1,10 +1,27 @@
 import streamlit as st
 import mysql.connector
+import mysql.connector.pooling
 
-def get_connection():
-    return mysql.connector.connect(
+def connection_config():
+    return dict(
         host=st.secrets["mysql"]["host"],
         user=st.secrets["mysql"]["user"],
         password=st.secrets["mysql"]["password"],
         database=st.secrets["mysql"]["database"]
     )
+
+@st.cache_resource
+def get_pool():
+    return mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="sales_dashboard",
+        pool_size=5,
+        **connection_config()
+    )
+
+def get_connection():
+    # Closing a pooled connection returns it to the pool instead of disconnecting.
+    try:
+        return get_pool().get_connection()
+    except mysql.connector.errors.PoolError:
+        # The pool does not wait for a free connection; when it is exhausted, open a one-off one.
+        return mysql.connector.connect(**connection_config())
@@ -0,0 +1,94 @@
+import io
+import threading
+import numpy as np
+from matplotlib.figure import Figure
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+
+# Kept out of app.py: Streamlit re-executes the main script on every rerun,
+# but an imported module is loaded once, so these are built once per process.
+_STYLES = getSampleStyleSheet()
+_HEADER_BG = colors.HexColor('#4F81BD')
+_ALT_BG = colors.HexColor('#DCE6F1')
+_TOP_BG = colors.HexColor('#FFD700')
+_ROW_BGS = (colors.whitesmoke, _ALT_BG, _TOP_BG)  # indexed by classify_rows() class id
+_BASE_TABLE_STYLE_CMDS = [
+    ('BACKGROUND', (0,0), (-1,0), _HEADER_BG),
+    ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
+    ('ALIGN',(0,0),(-1,-1),'CENTER'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+]
+
+# One chart figure reused for every export. Streamlit runs sessions on separate threads, hence the lock.
+_PDF_FIG = Figure(figsize=(6,3))
+_PDF_AX = _PDF_FIG.subplots()
+_PDF_FIG_LOCK = threading.Lock()
+
+def classify_rows(vals):
+    # Row background class per data row: 2 = top-3 amount, 1 = alternate stripe, 0 = plain.
+    vals = np.asarray(vals, dtype='float64')
+    present = ~np.isnan(vals)
+    known = vals[present]
+    top_thresh = np.partition(known, -3)[-3] if known.size >= 3 else -np.inf
+    stripe = (np.arange(vals.size) & 1).astype(np.uint8)
+    # Missing amounts are never highlighted, matching the old "value in top_amounts" check.
+    return np.where(present & (vals >= top_thresh), np.uint8(2), stripe)
+
+# -----------------------------
+# PDF CREATION FUNCTION
+# -----------------------------
+def create_pdf(df, report_title="Sales Report"):
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    elements = []
+    amt_col = 'total_amount' if 'total_amount' in df.columns else 'amount'
+    # Arrow-backed columns hold NULLs as pd.NA, which matplotlib and NumPy cannot take as floats.
+    amounts = df[amt_col].to_numpy(dtype='float64', na_value=np.nan)
+
+    elements.append(Paragraph(report_title, _STYLES['Title']))
+    elements.append(Paragraph("Generated using Streamlit & Python", _STYLES['Normal']))
+    elements.append(Spacer(1,12))
+
+    if 'product_name' in df.columns or 'category' in df.columns:
+        # A bare Figure renders with the headless Agg canvas and bypasses pyplot's global state.
+        chart_png = io.BytesIO()
+        with _PDF_FIG_LOCK:
+            _PDF_AX.clear()
+            if 'product_name' in df.columns:
+                _PDF_AX.bar(df['product_name'], amounts, color='skyblue')
+                _PDF_AX.set_ylabel("Amount")
+                _PDF_AX.set_title("Sales by Product")
+            else:
+                _PDF_AX.pie(np.nan_to_num(amounts), labels=df['category'], autopct='%1.1f%%')
+                _PDF_AX.set_title("Sales by Category")
+            _PDF_FIG.tight_layout()
+            # Render straight to PNG bytes in memory; no temporary chart file on disk.
+            _PDF_FIG.savefig(chart_png, format='png')
+        chart_png.seek(0)
+        elements.append(Image(chart_png, width=400, height=200))
+        elements.append(Spacer(1,12))
+
+    # Stringify column by column (money formatted in NumPy) instead of boxing every cell via df.values.
+    money_cols = {'amount', 'total_amount', 'unit_price'}
+    cols = [
+        np.char.mod('%.2f', df[c].to_numpy(dtype='float64', na_value=np.nan)).tolist() if c in money_cols else df[c].astype(str).tolist()
+        for c in df.columns
+    ]
+    data = [df.columns.tolist()] + [list(row) for row in zip(*cols)]
+    table = Table(data, repeatRows=1)
+
+    # Build every row background up front and attach them in a single TableStyle.
+    row_cmds = [
+        ('BACKGROUND', (0,i+1), (-1,i+1), _ROW_BGS[c])
+        for i, c in enumerate(classify_rows(amounts).tolist())
+    ]
+    table.setStyle(TableStyle(_BASE_TABLE_STYLE_CMDS + row_cmds))
+
+    elements.append(table)
+    doc.build(elements)
+
+    return output.getvalue()
+